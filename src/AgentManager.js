@@ -1,5 +1,59 @@
 import JSZip from 'jszip';
 
+// Code fences, optionally preceded by a "### filename.ext" header line;
+// every response is walked once with this and each block is classified below.
+// Both fences must start a line, so a stray ``` inside prose can't pair up
+// with a real fence and shift every block after it
+const CODE_FENCE_PATTERN = /^(?:###\s+([^\n]+\.[a-zA-Z0-9]+)\s*\n)?[ \t]*```([^\n]*)\n((?:[^\n]*\n)*?)[ \t]*```/gm;
+// Bare language tag after the opening fence (or none)
+const PLAIN_INFO_PATTERN = /^[a-zA-Z0-9]*$/;
+// ```language:filename.ext or ```language filename.ext
+const INLINE_FILENAME_PATTERN = /^([a-zA-Z0-9]+)[:\s]+([^\n]+\.[a-zA-Z0-9]+)\s*$/;
+// // filename.ext or <!-- filename.ext --> on the first line of the block
+const COMMENT_FILENAME_PATTERN = /^(?:\/\/|<!--|#|\/\*)\s*([^\n]+\.[a-zA-Z0-9]+)\s*(?:-->|\*\/)?\n/;
+
+// Extension -> syntax highlighter language
+const LANGUAGE_MAP = Object.freeze({
+  'js': 'javascript',
+  'jsx': 'jsx',
+  'ts': 'typescript',
+  'tsx': 'tsx',
+  'py': 'python',
+  'html': 'html',
+  'css': 'css',
+  'scss': 'scss',
+  'json': 'json',
+  'md': 'markdown',
+  'sql': 'sql',
+  'sh': 'bash',
+  'bash': 'bash',
+  'yaml': 'yaml',
+  'yml': 'yaml',
+  'xml': 'xml',
+  'java': 'java',
+  'c': 'c',
+  'cpp': 'cpp',
+  'h': 'c',
+  'hpp': 'cpp',
+  'rs': 'rust',
+  'go': 'go',
+  'rb': 'ruby',
+  'php': 'php',
+  'swift': 'swift',
+  'kt': 'kotlin',
+  'vue': 'vue',
+  'svelte': 'svelte',
+});
+
+// Extensions that open in the web preview sandbox
+const WEB_EXTENSIONS = new Set(['html', 'htm']);
+
+// Lowercased extension of a filename ('' when there is none)
+const getExtension = (filename) => {
+  const dot = filename.lastIndexOf('.');
+  return dot === -1 ? '' : filename.slice(dot + 1).toLowerCase();
+};
+
 // Virtual File System Manager
 class AgentManager {
   constructor() {
@@ -8,42 +62,48 @@ class AgentManager {
 
   // Parse code blocks from AI response and extract files
   parseFilesFromResponse(content) {
-    const files = [];
-    
-    // Pattern 1: ### filename.ext followed by code block
-    const headerPattern = /###\s+([^\n]+\.[a-zA-Z0-9]+)\s*\n```(?:[a-zA-Z0-9]+)?\n([\s\S]*?)```/g;
-    let match;
-    
-    while ((match = headerPattern.exec(content)) !== null) {
-      const filename = match[1].trim();
-      const code = match[2].trim();
-      files.push({ filename, code, language: this.getLanguageFromFilename(filename) });
-    }
+    // Files are grouped by how their name was given; header files take
+    // precedence, then inline fence names, then first-line comments
+    const headerFiles = [];
+    const inlineFiles = [];
+    const commentFiles = [];
 
-    // Pattern 2: ```language:filename.ext or ```language filename.ext
-    const inlinePattern = /```([a-zA-Z0-9]+)[:\s]+([^\n]+\.[a-zA-Z0-9]+)\s*\n([\s\S]*?)```/g;
-    
-    while ((match = inlinePattern.exec(content)) !== null) {
-      const language = match[1];
-      const filename = match[2].trim();
-      const code = match[3].trim();
-      
-      // Avoid duplicates
-      if (!files.find(f => f.filename === filename)) {
-        files.push({ filename, code, language });
+    for (const match of content.matchAll(CODE_FENCE_PATTERN)) {
+      const [, header, info, body] = match;
+      const plainInfo = PLAIN_INFO_PATTERN.test(info);
+
+      // Pattern 1: ### filename.ext followed by code block
+      if (header && plainInfo) {
+        const filename = header.trim();
+        headerFiles.push({ filename, code: body.trim(), language: this.getLanguageFromFilename(filename) });
+        continue;
+      }
+
+      // Pattern 2: ```language:filename.ext or ```language filename.ext
+      const inlineMatch = INLINE_FILENAME_PATTERN.exec(info);
+      if (inlineMatch) {
+        inlineFiles.push({ filename: inlineMatch[2].trim(), code: body.trim(), language: inlineMatch[1] });
+        continue;
+      }
+
+      // Pattern 3: // filename.ext or <!-- filename.ext --> at the start of code block
+      const commentMatch = plainInfo && COMMENT_FILENAME_PATTERN.exec(body);
+      if (commentMatch) {
+        commentFiles.push({
+          filename: commentMatch[1].trim(),
+          code: body.slice(commentMatch[0].length).trim(),
+          language: info || 'text',
+        });
       }
     }
 
-    // Pattern 3: // filename.ext or <!-- filename.ext --> at the start of code block
-    const commentPattern = /```([a-zA-Z0-9]*)\n(?:\/\/|<!--|#|\/\*)\s*([^\n]+\.[a-zA-Z0-9]+)\s*(?:-->|\*\/)?\n([\s\S]*?)```/g;
-    
-    while ((match = commentPattern.exec(content)) !== null) {
-      const language = match[1] || 'text';
-      const filename = match[2].trim();
-      const code = match[3].trim();
-      
-      if (!files.find(f => f.filename === filename)) {
-        files.push({ filename, code, language });
+    // Avoid duplicates
+    const files = headerFiles;
+    const seen = new Set(files.map(f => f.filename));
+    for (const file of [...inlineFiles, ...commentFiles]) {
+      if (!seen.has(file.filename)) {
+        seen.add(file.filename);
+        files.push(file);
       }
     }
 
@@ -52,51 +112,17 @@ class AgentManager {
 
   // Get language from filename extension
   getLanguageFromFilename(filename) {
-    const ext = filename.split('.').pop()?.toLowerCase();
-    const languageMap = {
-      'js': 'javascript',
-      'jsx': 'jsx',
-      'ts': 'typescript',
-      'tsx': 'tsx',
-      'py': 'python',
-      'html': 'html',
-      'css': 'css',
-      'scss': 'scss',
-      'json': 'json',
-      'md': 'markdown',
-      'sql': 'sql',
-      'sh': 'bash',
-      'bash': 'bash',
-      'yaml': 'yaml',
-      'yml': 'yaml',
-      'xml': 'xml',
-      'java': 'java',
-      'c': 'c',
-      'cpp': 'cpp',
-      'h': 'c',
-      'hpp': 'cpp',
-      'rs': 'rust',
-      'go': 'go',
-      'rb': 'ruby',
-      'php': 'php',
-      'swift': 'swift',
-      'kt': 'kotlin',
-      'vue': 'vue',
-      'svelte': 'svelte',
-    };
-    return languageMap[ext] || 'text';
+    return LANGUAGE_MAP[getExtension(filename)] || 'text';
   }
 
   // Check if file is web-executable (HTML/CSS/JS)
   isWebExecutable(filename) {
-    const ext = filename.split('.').pop()?.toLowerCase();
-    return ['html', 'htm'].includes(ext);
+    return WEB_EXTENSIONS.has(getExtension(filename));
   }
 
   // Check if file is Python
   isPython(filename) {
-    const ext = filename.split('.').pop()?.toLowerCase();
-    return ext === 'py';
+    return getExtension(filename) === 'py';
   }
 
   // Add files to VFS
@@ -144,7 +170,7 @@ class AgentManager {
     let htmlContent = htmlFile.code;
 
     // Find CSS files and inject them
-    const cssFiles = files.filter(f => f.filename.endsWith('.css'));
+    const cssFiles = files.filter(f => getExtension(f.filename) === 'css');
     cssFiles.forEach(cssFile => {
       const styleTag = `<style>\n${cssFile.code}\n</style>`;
       if (htmlContent.includes('</head>')) {
@@ -157,7 +183,7 @@ class AgentManager {
     });
 
     // Find JS files and inject them
-    const jsFiles = files.filter(f => f.filename.endsWith('.js') && !f.filename.endsWith('.json'));
+    const jsFiles = files.filter(f => getExtension(f.filename) === 'js');
     jsFiles.forEach(jsFile => {
       const scriptTag = `<script>\n${jsFile.code}\n</script>`;
       if (htmlContent.includes('</body>')) {
@@ -25,6 +25,73 @@ export const IMAGE_MODELS = {
   'gemini-2.5-flash-image': 'Gemini 2.5 Flash Image',
 };
 
+// Image-response patterns, compiled once at load
+const DATA_IMAGE_REGEX = /data:image\/[^;]+;base64,[A-Za-z0-9+/=]+/;
+const IMAGE_URL_REGEX = /https?:\/\/[^\s"<>]+/i;
+const IMAGE_EXT_REGEX = /\.(png|jpg|jpeg|gif|webp|svg)/i;
+const MARKDOWN_IMAGE_REGEX = /!\[.*?\]\((https?:\/\/[^\s)]+)\)/;
+const RAW_BASE64_REGEX = /^[A-Za-z0-9+/=\s]+$/;
+
+// Most recent chat messages sent as context with each request
+const MAX_HISTORY_MESSAGES = 40;
+
+// Build the request message list: system prompt plus a bounded history tail
+// Long chats stay fully stored locally, but only the tail is copied and sent
+const buildRequestMessages = (systemPrompt, messages) => {
+  let start = Math.max(0, messages.length - MAX_HISTORY_MESSAGES);
+  // Don't open the truncated window on an assistant reply
+  while (start > 0 && start < messages.length && messages[start].role !== 'user') {
+    start++;
+  }
+
+  const requestMessages = [{ role: 'system', content: systemPrompt }];
+  for (let i = start; i < messages.length; i++) {
+    requestMessages.push({ role: messages[i].role, content: messages[i].content });
+  }
+  return requestMessages;
+};
+
+// Longest string value kept verbatim in debug logs
+const LOG_STRING_LIMIT = 200;
+
+// Compact, bounded JSON for console logging
+// Image payloads and other long strings are cut before serializing, so
+// logging a response never copies a multi-MB base64 blob
+const summarizeForLog = (value, maxLength = 1500) => {
+  try {
+    const json = JSON.stringify(value, (key, val) => {
+      if (typeof val !== 'string') return val;
+      if (val.startsWith('data:image')) return '<stripped image data>';
+      if (val.length > LOG_STRING_LIMIT) return `${val.slice(0, LOG_STRING_LIMIT)}... (${val.length} chars)`;
+      return val;
+    });
+    return json.length > maxLength ? json.substring(0, maxLength) : json;
+  } catch (e) {
+    return String(value);
+  }
+};
+
+// POST a chat completion request and return the raw response
+// Single place where request bodies are serialized and API errors surfaced
+async function postChatCompletion(body, apiKey, signal) {
+  const response = await fetch(`${API_BASE_URL}/chat/completions`, {
+    method: 'POST',
+    signal,
+    headers: {
+      'Content-Type': 'application/json',
+      'Authorization': `Bearer ${apiKey}`,
+    },
+    body: JSON.stringify(body),
+  });
+
+  if (!response.ok) {
+    const error = await response.json().catch(() => ({ error: { message: 'Unknown error' } }));
+    throw new Error(error.error?.message || `API Error: ${response.status}`);
+  }
+
+  return response;
+}
+
 // Get API key from settings or use default
 export const getApiKey = (customKey) => {
   return customKey || DEFAULT_API_KEY;
@@ -39,6 +106,7 @@ export async function* streamChatCompletion(messages, options = {}) {
     temperature = 0.7,
     agentMode = false,
     forceNonStreaming = false,
+    signal, // AbortSignal - aborting stops generation and closes the stream
   } = options;
 
   // For thinking models and Gemini 3 models, use non-streaming to avoid content truncation
@@ -60,38 +128,20 @@ export async function* streamChatCompletion(messages, options = {}) {
     finalSystemPrompt += '\n\nWhen creating apps, provide the full code for every file including filename comments (e.g., ### filename.ext or ```language:filename.ext) so I can save them. Always include complete file contents.';
   }
 
-  const requestMessages = [
-    { role: 'system', content: finalSystemPrompt },
-    ...messages.map(msg => ({
-      role: msg.role,
-      content: msg.content,
-    })),
-  ];
+  const requestMessages = buildRequestMessages(finalSystemPrompt, messages);
 
-  const response = await fetch(`${API_BASE_URL}/chat/completions`, {
-    method: 'POST',
-    headers: {
-      'Content-Type': 'application/json',
-      'Authorization': `Bearer ${apiKey}`,
-    },
-    body: JSON.stringify({
-      model,
-      messages: requestMessages,
-      temperature,
-      stream: useStreaming,
-    }),
-  });
-
-  if (!response.ok) {
-    const error = await response.json().catch(() => ({ error: { message: 'Unknown error' } }));
-    throw new Error(error.error?.message || `API Error: ${response.status}`);
-  }
+  const response = await postChatCompletion({
+    model,
+    messages: requestMessages,
+    temperature,
+    stream: useStreaming,
+  }, apiKey, signal);
 
   // Handle non-streaming response for thinking models
   if (!useStreaming) {
     console.log('Using non-streaming mode for thinking model');
     const data = await response.json();
-    console.log('Non-streaming response:', JSON.stringify(data, null, 2).substring(0, 500));
+    console.log('Non-streaming response:', summarizeForLog(data, 500));
     
     const content = data.choices?.[0]?.message?.content || '';
     if (content) {
@@ -162,7 +212,7 @@ export async function* streamChatCompletion(messages, options = {}) {
       const json = JSON.parse(jsonStr);
       
       chunkCount++;
-      console.log(`Chunk #${chunkCount}:`, JSON.stringify(json, null, 2).substring(0, 300));
+      console.log(`Chunk #${chunkCount}:`, summarizeForLog(json, 300));
       
       const content = extractContent(json);
       return { content, incomplete: false };
@@ -296,32 +346,14 @@ export async function chatCompletion(messages, options = {}) {
     finalSystemPrompt += '\n\nWhen creating apps, provide the full code for every file including filename comments (e.g., ### filename.ext or ```language:filename.ext) so I can save them. Always include complete file contents.';
   }
 
-  const requestMessages = [
-    { role: 'system', content: finalSystemPrompt },
-    ...messages.map(msg => ({
-      role: msg.role,
-      content: msg.content,
-    })),
-  ];
+  const requestMessages = buildRequestMessages(finalSystemPrompt, messages);
 
-  const response = await fetch(`${API_BASE_URL}/chat/completions`, {
-    method: 'POST',
-    headers: {
-      'Content-Type': 'application/json',
-      'Authorization': `Bearer ${apiKey}`,
-    },
-    body: JSON.stringify({
-      model,
-      messages: requestMessages,
-      temperature,
-      stream: false,
-    }),
-  });
-
-  if (!response.ok) {
-    const error = await response.json().catch(() => ({ error: { message: 'Unknown error' } }));
-    throw new Error(error.error?.message || `API Error: ${response.status}`);
-  }
+  const response = await postChatCompletion({
+    model,
+    messages: requestMessages,
+    temperature,
+    stream: false,
+  }, apiKey);
 
   const data = await response.json();
   return data.choices?.[0]?.message?.content || '';
@@ -335,31 +367,19 @@ export async function generateImage(prompt, options = {}) {
   } = options;
 
   try {
-    const response = await fetch(`${API_BASE_URL}/chat/completions`, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-        'Authorization': `Bearer ${apiKey}`,
-      },
-      body: JSON.stringify({
-        model,
-        messages: [
-          {
-            role: 'user',
-            content: `Generate an image: ${prompt}`,
-          },
-        ],
-        stream: false,
-      }),
-    });
-
-    if (!response.ok) {
-      const error = await response.json().catch(() => ({ error: { message: 'Unknown error' } }));
-      throw new Error(error.error?.message || `API Error: ${response.status}`);
-    }
+    const response = await postChatCompletion({
+      model,
+      messages: [
+        {
+          role: 'user',
+          content: `Generate an image: ${prompt}`,
+        },
+      ],
+      stream: false,
+    }, apiKey);
 
     const data = await response.json();
-    console.log('Image API response:', JSON.stringify(data, null, 2));
+    console.log('Image API response:', summarizeForLog(data));
     
     // Helper function to extract image from parts
     const extractFromParts = (parts) => {
@@ -448,7 +468,7 @@ export async function generateImage(prompt, options = {}) {
         }
         // Text part with image
         if (item.type === 'text' && item.text) {
-          const base64Match = item.text.match(/data:image\/[^;]+;base64,[A-Za-z0-9+/=]+/);
+          const base64Match = item.text.match(DATA_IMAGE_REGEX);
           if (base64Match) {
             return { type: 'base64', data: base64Match[0] };
           }
@@ -459,30 +479,33 @@ export async function generateImage(prompt, options = {}) {
     // 4. Parse string content
     if (typeof content === 'string' && content) {
       // Check if it's a base64 image with data URI
-      const base64Match = content.match(/data:image\/[^;]+;base64,[A-Za-z0-9+/=]+/);
+      const base64Match = content.match(DATA_IMAGE_REGEX);
       if (base64Match) {
         return { type: 'base64', data: base64Match[0] };
       }
       
       // Check if it's a URL
-      const urlMatch = content.match(/https?:\/\/[^\s"<>]+/i);
+      const urlMatch = content.match(IMAGE_URL_REGEX);
       if (urlMatch) {
         const url = urlMatch[0];
-        if (/\.(png|jpg|jpeg|gif|webp|svg)/i.test(url) || url.includes('image')) {
+        if (IMAGE_EXT_REGEX.test(url) || url.includes('image')) {
           return { type: 'url', data: url };
         }
       }
 
       // Check for markdown image syntax
-      const mdMatch = content.match(/!\[.*?\]\((https?:\/\/[^\s)]+)\)/);
+      const mdMatch = content.match(MARKDOWN_IMAGE_REGEX);
       if (mdMatch) {
         return { type: 'url', data: mdMatch[1] };
       }
 
       // Return raw content if it might be base64 without prefix
-      const cleanContent = content.replace(/\s/g, '');
-      if (cleanContent.length > 100 && /^[A-Za-z0-9+/=]+$/.test(cleanContent)) {
-        return { type: 'base64', data: `data:image/png;base64,${cleanContent}` };
+      // (validate first so plain text bails on its first non-base64 char without a copy)
+      if (RAW_BASE64_REGEX.test(content)) {
+        const cleanContent = content.replace(/\s/g, '');
+        if (cleanContent.length > 100) {
+          return { type: 'base64', data: `data:image/png;base64,${cleanContent}` };
+        }
       }
       
       // Return text content for debugging
@@ -520,23 +543,31 @@ export function extractUrls(text) {
   return matches ? [...new Set(matches)] : [];
 }
 
-// Fetch URL content via CORS proxy
-export async function fetchUrlContent(url) {
-  // List of CORS proxy services to try
-  const corsProxies = [
-    (u) => `https://api.allorigins.win/raw?url=${encodeURIComponent(u)}`,
-    (u) => `https://corsproxy.io/?${encodeURIComponent(u)}`,
-    (u) => `https://api.codetabs.com/v1/proxy?quest=${encodeURIComponent(u)}`,
-  ];
-
-  for (const getProxyUrl of corsProxies) {
+// CORS proxy services to try, in order of preference
+const CORS_PROXIES = [
+  (u) => `https://api.allorigins.win/raw?url=${encodeURIComponent(u)}`,
+  (u) => `https://corsproxy.io/?${encodeURIComponent(u)}`,
+  (u) => `https://api.codetabs.com/v1/proxy?quest=${encodeURIComponent(u)}`,
+  (u) => `https://thingproxy.freeboard.io/fetch/${u}`,
+];
+
+// Index of the proxy that last succeeded - later requests start there
+// instead of paying for the same failed round trips every time
+let preferredProxyIndex = 0;
+
+// Fetch a page as text through the CORS proxies, or null if all fail
+async function fetchViaProxy(url, { timeoutMs, headers } = {}) {
+  for (let attempt = 0; attempt < CORS_PROXIES.length; attempt++) {
+    const index = (preferredProxyIndex + attempt) % CORS_PROXIES.length;
     try {
-      const proxyUrl = getProxyUrl(url);
-      console.log('Fetching via proxy:', proxyUrl);
+      const proxyUrl = CORS_PROXIES[index](url);
+      console.log('Trying proxy:', proxyUrl.substring(0, 80));
       
       const response = await fetch(proxyUrl, {
+        signal: timeoutMs ? AbortSignal.timeout(timeoutMs) : undefined,
         headers: {
           'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+          ...headers,
         },
       });
       
@@ -545,21 +576,78 @@ export async function fetchUrlContent(url) {
         continue;
       }
       
-      const html = await response.text();
-      
-      // Extract meaningful content from HTML
-      const content = extractTextFromHtml(html, url);
-      return {
-        success: true,
-        url,
-        content,
-        title: extractTitle(html),
-      };
+      const text = await response.text();
+      preferredProxyIndex = index;
+      return text;
     } catch (error) {
-      console.log('Proxy error:', error.message);
+      console.log('Proxy failed:', error.message);
       continue;
     }
   }
+  return null;
+}
+
+// Small LRU cache of fetched page content, keyed by URL
+// Follow-up questions about the same page (and repeated search hits) would
+// otherwise go through the CORS proxies again
+const URL_CACHE_MAX_ENTRIES = 16;
+const URL_CACHE_MAX_CHARS = 256 * 1024;
+const URL_CACHE_TTL_MS = 5 * 60 * 1000;
+const urlContentCache = new Map();
+let urlCacheChars = 0;
+
+function getCachedUrlContent(url) {
+  const entry = urlContentCache.get(url);
+  if (!entry) return null;
+  urlContentCache.delete(url);
+  if (Date.now() - entry.cachedAt > URL_CACHE_TTL_MS) {
+    urlCacheChars -= entry.size;
+    return null;
+  }
+  // Re-insert to mark as most recently used
+  urlContentCache.set(url, entry);
+  return entry.result;
+}
+
+function cacheUrlContent(url, result) {
+  const size = result.content.length + result.title.length;
+  if (size > URL_CACHE_MAX_CHARS) return;
+
+  const previous = urlContentCache.get(url);
+  if (previous) {
+    urlContentCache.delete(url);
+    urlCacheChars -= previous.size;
+  }
+  urlContentCache.set(url, { result, size, cachedAt: Date.now() });
+  urlCacheChars += size;
+
+  // Evict least recently used entries (Map iterates in insertion order)
+  for (const [key, entry] of urlContentCache) {
+    if (urlContentCache.size <= URL_CACHE_MAX_ENTRIES && urlCacheChars <= URL_CACHE_MAX_CHARS) break;
+    urlContentCache.delete(key);
+    urlCacheChars -= entry.size;
+  }
+}
+
+// Fetch URL content via CORS proxy
+export async function fetchUrlContent(url) {
+  const cached = getCachedUrlContent(url);
+  if (cached) return cached;
+
+  const html = await fetchViaProxy(url, { timeoutMs: 10000 });
+  
+  if (html !== null) {
+    // Extract meaningful content from HTML
+    const content = extractTextFromHtml(html, url);
+    const result = {
+      success: true,
+      url,
+      content,
+      title: extractTitle(html),
+    };
+    cacheUrlContent(url, result);
+    return result;
+  }
   
   return {
     success: false,
@@ -568,6 +656,23 @@ export async function fetchUrlContent(url) {
   };
 }
 
+// Common HTML entities, decoded in a single pass over the text
+const HTML_ENTITIES = {
+  nbsp: ' ',
+  amp: '&',
+  lt: '<',
+  gt: '>',
+  quot: '"',
+  '#39': "'",
+};
+const HTML_ENTITY_REGEX = /&(nbsp|amp|lt|gt|quot|#39);/g;
+
+// Decode HTML entities - one scan instead of a chained replace per entity
+// (which also double-decoded input like "&amp;lt;")
+function decodeHtmlEntities(text) {
+  return text.replace(HTML_ENTITY_REGEX, (_, name) => HTML_ENTITIES[name]);
+}
+
 // Extract title from HTML
 function extractTitle(html) {
   const titleMatch = html.match(/<title[^>]*>([^<]+)<\/title>/i);
@@ -611,14 +716,7 @@ function extractTextFromHtml(html, url) {
   }
   
   // Remove remaining HTML tags
-  mainContent = mainContent
-    .replace(/<[^>]+>/g, ' ')
-    .replace(/&nbsp;/g, ' ')
-    .replace(/&amp;/g, '&')
-    .replace(/&lt;/g, '<')
-    .replace(/&gt;/g, '>')
-    .replace(/&quot;/g, '"')
-    .replace(/&#39;/g, "'")
+  mainContent = decodeHtmlEntities(mainContent.replace(/<[^>]+>/g, ' '))
     .replace(/\s+/g, ' ')
     .trim();
   
@@ -636,141 +734,128 @@ export async function performWebSearch(query) {
   console.log('🔍 Starting enhanced web search for:', query);
   const allResults = [];
   
-  // CORS proxies for accessing search engines
-  const corsProxies = [
-    (u) => `https://api.allorigins.win/raw?url=${encodeURIComponent(u)}`,
-    (u) => `https://corsproxy.io/?${encodeURIComponent(u)}`,
-    (u) => `https://api.codetabs.com/v1/proxy?quest=${encodeURIComponent(u)}`,
-    (u) => `https://thingproxy.freeboard.io/fetch/${u}`,
-  ];
-  
-  // Helper to fetch with multiple proxies
-  async function fetchWithProxies(url, timeoutMs = 10000) {
-    for (const getProxyUrl of corsProxies) {
-      try {
-        const proxyUrl = getProxyUrl(url);
-        console.log('Trying proxy:', proxyUrl.substring(0, 80));
-        const response = await fetch(proxyUrl, {
-          signal: AbortSignal.timeout(timeoutMs),
-          headers: {
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9,ru;q=0.8',
-          }
-        });
-        if (response.ok) {
-          return await response.text();
-        }
-      } catch (e) {
-        console.log('Proxy failed:', e.message);
-        continue;
-      }
-    }
-    return null;
-  }
+  // Each source fetches and normalizes its own entries inside its try/catch,
+  // so a failing or malformed source is dropped without failing the search
   
   // SOURCE 1: DuckDuckGo HTML Search (PRIMARY - gives actual search results)
-  try {
-    const searchUrl = `https://html.duckduckgo.com/html/?q=${encodeURIComponent(query)}`;
-    const html = await fetchWithProxies(searchUrl);
-    
-    if (html) {
-      const scrapedResults = parseSearchResults(html);
-      console.log(`📄 DuckDuckGo HTML: found ${scrapedResults.length} results`);
+  const searchDuckDuckGoHtml = async () => {
+    try {
+      const searchUrl = `https://html.duckduckgo.com/html/?q=${encodeURIComponent(query)}`;
+      const html = await fetchViaProxy(searchUrl, {
+        timeoutMs: 10000,
+        headers: { 'Accept-Language': 'en-US,en;q=0.9,ru;q=0.8' },
+      });
       
-      for (const result of scrapedResults) {
-        if (!allResults.some(r => r.url === result.url)) {
-          allResults.push(result);
-        }
+      if (html) {
+        const scrapedResults = parseSearchResults(html);
+        console.log(`📄 DuckDuckGo HTML: found ${scrapedResults.length} results`);
+        
+        // Scraped results are only de-duplicated among themselves
+        const seenUrls = new Set();
+        return scrapedResults.filter(result => {
+          if (seenUrls.has(result.url)) return false;
+          seenUrls.add(result.url);
+          return true;
+        });
       }
+    } catch (error) {
+      console.log('DuckDuckGo HTML error:', error.message);
     }
-  } catch (error) {
-    console.log('DuckDuckGo HTML error:', error.message);
-  }
+    return [];
+  };
   
   // SOURCE 2: DuckDuckGo Instant Answer API (for quick answers)
-  try {
-    const ddgApiUrl = `https://api.duckduckgo.com/?q=${encodeURIComponent(query)}&format=json&no_html=1&skip_disambig=1`;
-    const response = await fetch(ddgApiUrl, { signal: AbortSignal.timeout(5000) });
-    if (response.ok) {
-      const data = await response.json();
-      
-      if (data.Abstract && data.Abstract.length > 30) {
-        allResults.unshift({
-          title: data.Heading || 'Quick Answer',
-          snippet: data.Abstract,
-          url: data.AbstractURL || '',
-          source: data.AbstractSource || 'DuckDuckGo'
-        });
-      }
-      
-      if (data.Answer) {
-        allResults.unshift({
-          title: 'Direct Answer',
-          snippet: data.Answer,
-          url: '',
-          source: 'DuckDuckGo'
-        });
-      }
-      
-      // Related topics
-      if (data.RelatedTopics) {
-        for (const topic of data.RelatedTopics.slice(0, 3)) {
-          if (topic.Text && !allResults.some(r => r.snippet === topic.Text)) {
-            allResults.push({
-              title: topic.FirstURL ? new URL(topic.FirstURL).hostname : 'Related',
-              snippet: topic.Text,
-              url: topic.FirstURL || '',
-              source: 'DuckDuckGo'
-            });
+  const searchDuckDuckGoApi = async () => {
+    const answers = [];
+    const related = [];
+    try {
+      const ddgApiUrl = `https://api.duckduckgo.com/?q=${encodeURIComponent(query)}&format=json&no_html=1&skip_disambig=1`;
+      const response = await fetch(ddgApiUrl, { signal: AbortSignal.timeout(5000) });
+      if (response.ok) {
+        const data = await response.json();
+        
+        if (data.Answer) {
+          answers.push({
+            title: 'Direct Answer',
+            snippet: data.Answer,
+            url: '',
+            source: 'DuckDuckGo'
+          });
+        }
+        
+        if (data.Abstract && data.Abstract.length > 30) {
+          answers.push({
+            title: data.Heading || 'Quick Answer',
+            snippet: data.Abstract,
+            url: data.AbstractURL || '',
+            source: data.AbstractSource || 'DuckDuckGo'
+          });
+        }
+        
+        // Related topics
+        if (data.RelatedTopics) {
+          for (const topic of data.RelatedTopics.slice(0, 3)) {
+            if (topic.Text) {
+              related.push({
+                title: topic.FirstURL ? new URL(topic.FirstURL).hostname : 'Related',
+                snippet: topic.Text,
+                url: topic.FirstURL || '',
+                source: 'DuckDuckGo'
+              });
+            }
           }
         }
       }
+    } catch (error) {
+      console.log('DuckDuckGo API error:', error.message);
     }
-  } catch (error) {
-    console.log('DuckDuckGo API error:', error.message);
-  }
+    return { answers, related };
+  };
   
   // SOURCE 3: Wikipedia (for encyclopedic info)
-  try {
-    // Try Wikipedia search first
-    const wikiSearchUrl = `https://en.wikipedia.org/w/api.php?action=query&list=search&srsearch=${encodeURIComponent(query)}&format=json&origin=*&srlimit=3`;
-    const wikiSearchResponse = await fetch(wikiSearchUrl, { signal: AbortSignal.timeout(5000) });
-    
-    if (wikiSearchResponse.ok) {
-      const wikiData = await wikiSearchResponse.json();
-      const searchResults = wikiData.query?.search || [];
+  const searchWikipedia = async () => {
+    try {
+      // Try Wikipedia search first
+      const wikiSearchUrl = `https://en.wikipedia.org/w/api.php?action=query&list=search&srsearch=${encodeURIComponent(query)}&format=json&origin=*&srlimit=3`;
+      const wikiSearchResponse = await fetch(wikiSearchUrl, { signal: AbortSignal.timeout(5000) });
       
-      for (const result of searchResults) {
-        const snippet = result.snippet?.replace(/<[^>]+>/g, '') || '';
-        if (snippet && !allResults.some(r => r.title === result.title)) {
-          allResults.push({
-            title: result.title,
-            snippet: snippet,
-            url: `https://en.wikipedia.org/wiki/${encodeURIComponent(result.title.replace(/ /g, '_'))}`,
-            source: 'Wikipedia'
-          });
+      if (wikiSearchResponse.ok) {
+        const wikiData = await wikiSearchResponse.json();
+        const entries = [];
+        for (const result of wikiData.query?.search || []) {
+          const snippet = result.snippet?.replace(/<[^>]+>/g, '') || '';
+          if (snippet) {
+            entries.push({
+              title: result.title,
+              snippet: snippet,
+              url: `https://en.wikipedia.org/wiki/${encodeURIComponent(result.title.replace(/ /g, '_'))}`,
+              source: 'Wikipedia'
+            });
+          }
         }
+        return entries;
       }
+    } catch (error) {
+      console.log('Wikipedia search error:', error.message);
     }
-  } catch (error) {
-    console.log('Wikipedia search error:', error.message);
-  }
+    return [];
+  };
   
   // SOURCE 4: Russian Wikipedia (for Russian queries)
   const hasRussian = /[а-яё]/i.test(query);
-  if (hasRussian) {
+  const searchRussianWikipedia = async () => {
+    if (!hasRussian) return [];
     try {
       const ruWikiUrl = `https://ru.wikipedia.org/w/api.php?action=query&list=search&srsearch=${encodeURIComponent(query)}&format=json&origin=*&srlimit=3`;
       const ruWikiResponse = await fetch(ruWikiUrl, { signal: AbortSignal.timeout(5000) });
       
       if (ruWikiResponse.ok) {
         const ruWikiData = await ruWikiResponse.json();
-        const results = ruWikiData.query?.search || [];
-        
-        for (const result of results) {
+        const entries = [];
+        for (const result of ruWikiData.query?.search || []) {
           const snippet = result.snippet?.replace(/<[^>]+>/g, '') || '';
-          if (snippet && !allResults.some(r => r.title === result.title)) {
-            allResults.push({
+          if (snippet) {
+            entries.push({
               title: result.title,
               snippet: snippet,
               url: `https://ru.wikipedia.org/wiki/${encodeURIComponent(result.title.replace(/ /g, '_'))}`,
@@ -778,86 +863,120 @@ export async function performWebSearch(query) {
             });
           }
         }
+        return entries;
       }
     } catch (error) {
       console.log('Russian Wikipedia error:', error.message);
     }
-  }
+    return [];
+  };
   
   // SOURCE 5: Hacker News (for any query - great for recent info)
-  try {
-    const hnSearchUrl = `https://hn.algolia.com/api/v1/search?query=${encodeURIComponent(query)}&tags=story&hitsPerPage=5`;
-    const hnResponse = await fetch(hnSearchUrl, { signal: AbortSignal.timeout(5000) });
-    
-    if (hnResponse.ok) {
-      const hnData = await hnResponse.json();
-      for (const hit of (hnData.hits || []).slice(0, 5)) {
-        if (hit.title && !allResults.some(r => r.title === hit.title)) {
-          allResults.push({
+  const searchHackerNews = async () => {
+    try {
+      const hnSearchUrl = `https://hn.algolia.com/api/v1/search?query=${encodeURIComponent(query)}&tags=story&hitsPerPage=5`;
+      const hnResponse = await fetch(hnSearchUrl, { signal: AbortSignal.timeout(5000) });
+      
+      if (hnResponse.ok) {
+        const hnData = await hnResponse.json();
+        return (hnData.hits || []).slice(0, 5)
+          .filter(hit => hit.title)
+          .map(hit => ({
             title: hit.title,
-            snippet: `${hit.points || 0} points | ${hit.num_comments || 0} comments | by ${hit.author || 'unknown'} | ${new Date(hit.created_at).toLocaleDateString()}`,
+            snippet: `${hit.points || 0} points | ${hit.num_comments || 0} comments | by ${hit.author || 'unknown'} | ${formatDate(new Date(hit.created_at))}`,
             url: hit.url || `https://news.ycombinator.com/item?id=${hit.objectID}`,
             source: 'Hacker News'
-          });
-        }
+          }));
       }
+    } catch (error) {
+      console.log('HN API error:', error.message);
     }
-  } catch (error) {
-    console.log('HN API error:', error.message);
-  }
+    return [];
+  };
   
   // SOURCE 6: Stack Overflow (for programming queries)
   const progKeywords = ['code', 'error', 'function', 'how to', 'tutorial', 'example', 'javascript', 'python', 'react', 'typescript', 'css', 'html', 'api', 'программирование', 'ошибка', 'код'];
-  const isProgrammingQuery = progKeywords.some(kw => query.toLowerCase().includes(kw));
+  const lowerQuery = query.toLowerCase();
+  const isProgrammingQuery = progKeywords.some(kw => lowerQuery.includes(kw));
   
-  if (isProgrammingQuery) {
+  const searchStackOverflow = async () => {
+    if (!isProgrammingQuery) return [];
     try {
       const soUrl = `https://api.stackexchange.com/2.3/search/advanced?order=desc&sort=relevance&q=${encodeURIComponent(query)}&site=stackoverflow&pagesize=3&filter=!nNPvSNdWme`;
       const soResponse = await fetch(soUrl, { signal: AbortSignal.timeout(5000) });
       
       if (soResponse.ok) {
         const soData = await soResponse.json();
-        for (const item of (soData.items || []).slice(0, 3)) {
-          if (item.title && !allResults.some(r => r.url === item.link)) {
-            allResults.push({
-              title: item.title.replace(/&quot;/g, '"').replace(/&#39;/g, "'").replace(/&amp;/g, '&'),
-              snippet: `Score: ${item.score} | Answers: ${item.answer_count} | Views: ${item.view_count}`,
-              url: item.link,
-              source: 'Stack Overflow'
-            });
-          }
-        }
+        return (soData.items || []).slice(0, 3)
+          .filter(item => item.title)
+          .map(item => ({
+            title: decodeHtmlEntities(item.title),
+            snippet: `Score: ${item.score} | Answers: ${item.answer_count} | Views: ${item.view_count}`,
+            url: item.link,
+            source: 'Stack Overflow'
+          }));
       }
     } catch (error) {
       console.log('Stack Overflow error:', error.message);
     }
-  }
+    return [];
+  };
   
   // SOURCE 7: Reddit Search (via old.reddit.com for better scraping)
-  try {
-    const redditUrl = `https://www.reddit.com/search.json?q=${encodeURIComponent(query)}&limit=3&sort=relevance`;
-    const redditResponse = await fetch(redditUrl, {
-      signal: AbortSignal.timeout(5000),
-      headers: { 'User-Agent': 'Mozilla/5.0' }
-    });
-    
-    if (redditResponse.ok) {
-      const redditData = await redditResponse.json();
-      for (const post of (redditData.data?.children || []).slice(0, 3)) {
-        const d = post.data;
-        if (d.title && !allResults.some(r => r.url === `https://reddit.com${d.permalink}`)) {
-          allResults.push({
+  const searchReddit = async () => {
+    try {
+      const redditUrl = `https://www.reddit.com/search.json?q=${encodeURIComponent(query)}&limit=3&sort=relevance`;
+      const redditResponse = await fetch(redditUrl, {
+        signal: AbortSignal.timeout(5000),
+        headers: { 'User-Agent': 'Mozilla/5.0' }
+      });
+      
+      if (redditResponse.ok) {
+        const redditData = await redditResponse.json();
+        return (redditData.data?.children || []).slice(0, 3)
+          .map(post => post.data)
+          .filter(d => d.title)
+          .map(d => ({
             title: d.title,
             snippet: `r/${d.subreddit} | ${d.score} upvotes | ${d.num_comments} comments`,
             url: `https://reddit.com${d.permalink}`,
             source: 'Reddit'
-          });
-        }
+          }));
       }
+    } catch (error) {
+      console.log('Reddit error:', error.message);
     }
-  } catch (error) {
-    console.log('Reddit error:', error.message);
-  }
+    return [];
+  };
+  
+  // Query every source concurrently, then merge in priority order
+  const [scrapedResults, ddgResults, wikiResults, ruWikiResults, hnResults, soResults, redditResults] = await Promise.all([
+    searchDuckDuckGoHtml(),
+    searchDuckDuckGoApi(),
+    searchWikipedia(),
+    searchRussianWikipedia(),
+    searchHackerNews(),
+    searchStackOverflow(),
+    searchReddit(),
+  ]);
+  
+  // Append entries whose `key` field isn't already in the results
+  const appendUnique = (entries, key) => {
+    for (const entry of entries) {
+      if (!allResults.some(r => r[key] === entry[key])) {
+        allResults.push(entry);
+      }
+    }
+  };
+  
+  // Quick answers lead the list, then the scraped results
+  allResults.push(...ddgResults.answers, ...scrapedResults);
+  appendUnique(ddgResults.related, 'snippet');
+  appendUnique(wikiResults, 'title');
+  appendUnique(ruWikiResults, 'title');
+  appendUnique(hnResults, 'title');
+  appendUnique(soResults, 'url');
+  appendUnique(redditResults, 'url');
   
   console.log(`🔍 Total search results: ${allResults.length}`);
   
@@ -896,7 +1015,7 @@ function parseSearchResults(html) {
     const titleMatch = block.match(/class="result__a"[^>]*>([^<]+)</i) ||
                        block.match(/<a[^>]*>([^<]{10,})</i);
     if (titleMatch) {
-      title = titleMatch[1].replace(/&amp;/g, '&').replace(/&quot;/g, '"').trim();
+      title = decodeHtmlEntities(titleMatch[1]).trim();
     }
     
     // Extract snippet
@@ -904,7 +1023,7 @@ function parseSearchResults(html) {
     const snippetMatch = block.match(/class="result__snippet"[^>]*>([^<]+)</i) ||
                          block.match(/class="result__snippet"[^>]*>([\s\S]*?)<\/a>/i);
     if (snippetMatch) {
-      snippet = snippetMatch[1].replace(/<[^>]+>/g, '').replace(/&amp;/g, '&').replace(/&quot;/g, '"').trim();
+      snippet = decodeHtmlEntities(snippetMatch[1].replace(/<[^>]+>/g, '')).trim();
     }
     
     if (title && url && url.startsWith('http')) {
@@ -926,8 +1045,8 @@ function parseSearchResults(html) {
     while ((match = linkPattern.exec(html)) !== null && results.length < 10) {
       try {
         const url = decodeURIComponent(match[1]);
-        const title = match[2].replace(/&amp;/g, '&').trim();
-        const snippet = match[3].replace(/&amp;/g, '&').trim();
+        const title = decodeHtmlEntities(match[2]).trim();
+        const snippet = decodeHtmlEntities(match[3]).trim();
         
         if (url.startsWith('http') && !results.some(r => r.url === url)) {
           results.push({ title, snippet, url, source: 'Web' });
@@ -982,6 +1101,7 @@ export async function* streamWebSearchCompletion(query, urls, options = {}) {
     temperature = 0.7,
     previousMessages = [],
     userTimezone = 'Asia/Yakutsk',
+    signal,
   } = options;
 
   let webContext = '';
@@ -1084,19 +1204,23 @@ export async function* streamWebSearchCompletion(query, urls, options = {}) {
         .slice(0, 2)
         .map(r => r.url);
       
-      for (const url of topUrls) {
-        try {
-          const content = await fetchUrlContent(url);
-          if (content.success) {
-            webContext += `\n--- Full content from: ${url} ---\n`;
-            if (content.title) webContext += `Page Title: ${content.title}\n`;
-            webContext += content.content.substring(0, 3000);
-            webContext += '\n---\n';
-          }
-        } catch (e) {
+      // Fetch the pages in parallel, then append them in result order
+      const topContents = await Promise.all(topUrls.map(url =>
+        fetchUrlContent(url).catch(e => {
           console.log('Failed to fetch URL content:', e.message);
+          return null;
+        })
+      ));
+      
+      topUrls.forEach((url, i) => {
+        const content = topContents[i];
+        if (content?.success) {
+          webContext += `\n--- Full content from: ${url} ---\n`;
+          if (content.title) webContext += `Page Title: ${content.title}\n`;
+          webContext += content.content.substring(0, 3000);
+          webContext += '\n---\n';
         }
-      }
+      });
     }
   }
   
@@ -1104,8 +1228,11 @@ export async function* streamWebSearchCompletion(query, urls, options = {}) {
   if (urls && urls.length > 0) {
     console.log('Fetching content from URLs:', urls);
     
-    for (const url of urls.slice(0, 3)) {
-      const result = await fetchUrlContent(url);
+    const requestedUrls = urls.slice(0, 3);
+    const results = await Promise.all(requestedUrls.map(url => fetchUrlContent(url)));
+    
+    requestedUrls.forEach((url, i) => {
+      const result = results[i];
       if (result.success) {
         webContext += `\n--- Content from: ${url} ---\n`;
         if (result.title) webContext += `Title: ${result.title}\n`;
@@ -1114,7 +1241,7 @@ export async function* streamWebSearchCompletion(query, urls, options = {}) {
       } else {
         webContext += `\n--- Could not fetch: ${url} ---\nError: ${result.error}\n`;
       }
-    }
+    });
   }
 
   // Create enhanced system prompt for web search mode
@@ -1143,6 +1270,7 @@ ${webContext ? webContext : 'No web results available for this query.'}`;
     apiKey,
     systemPrompt: webSearchSystemPrompt,
     temperature,
+    signal,
   })) {
     yield chunk;
   }
@@ -1174,12 +1302,16 @@ export function buildWebSearchContext(query, urlContents) {
 // REAL-TIME INFORMATION FUNCTIONS
 // ============================================
 
-// Get current date and time
-export function getCurrentDateTime(timezone = 'UTC') {
-  const now = new Date();
-  
-  try {
-    const formatter = new Intl.DateTimeFormat('ru-RU', {
+// Intl formatters are costly to construct (locale and timezone data lookup),
+// so build each one once and reuse it
+const dateTimeFormatters = new Map();
+const dateFormatters = new Map();
+
+// Full date-time formatter for a timezone (throws RangeError if invalid)
+function getDateTimeFormatter(timezone) {
+  let formatter = dateTimeFormatters.get(timezone);
+  if (!formatter) {
+    formatter = new Intl.DateTimeFormat('ru-RU', {
       timeZone: timezone,
       weekday: 'long',
       year: 'numeric',
@@ -1190,6 +1322,29 @@ export function getCurrentDateTime(timezone = 'UTC') {
       second: '2-digit',
       timeZoneName: 'short',
     });
+    dateTimeFormatters.set(timezone, formatter);
+  }
+  return formatter;
+}
+
+// Short date string, equivalent to date.toLocaleDateString(locale)
+function formatDate(date, locale) {
+  // Intl formatters throw on invalid dates where toLocaleDateString doesn't
+  if (Number.isNaN(date.getTime())) return 'Invalid Date';
+  let formatter = dateFormatters.get(locale);
+  if (!formatter) {
+    formatter = new Intl.DateTimeFormat(locale);
+    dateFormatters.set(locale, formatter);
+  }
+  return formatter.format(date);
+}
+
+// Get current date and time
+export function getCurrentDateTime(timezone = 'UTC') {
+  const now = new Date();
+  
+  try {
+    const formatter = getDateTimeFormatter(timezone);
     
     return {
       formatted: formatter.format(now),
@@ -1284,7 +1439,7 @@ export async function getExchangeRate(fromCurrency, toCurrency, amount = 1) {
       amount,
       rate,
       result: converted.toFixed(4),
-      lastUpdated: data.date || new Date().toLocaleDateString(),
+      lastUpdated: data.date || formatDate(new Date()),
     };
   } catch (error) {
     return {
@@ -1317,7 +1472,7 @@ export async function getNewsHeadlines(topic = null, maxResults = 10) {
           source: 'Hacker News',
           points: hit.points || 0,
           comments: hit.num_comments || 0,
-          date: hit.created_at ? new Date(hit.created_at).toLocaleDateString('ru-RU') : undefined,
+          date: hit.created_at ? formatDate(new Date(hit.created_at), 'ru-RU') : undefined,
         });
       }
     }
@@ -1344,7 +1499,7 @@ export async function getNewsHeadlines(topic = null, maxResults = 10) {
                 title: news.story.replace(/<[^>]+>/g, ''),
                 url: news.links?.[0]?.content_urls?.desktop?.page || '',
                 source: 'Wikipedia',
-                date: today.toLocaleDateString('ru-RU'),
+                date: formatDate(today, 'ru-RU'),
               });
             }
           }
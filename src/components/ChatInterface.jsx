@@ -1,4 +1,4 @@
-import React, { useState, useRef, useEffect, useCallback, useMemo, memo } from 'react';
+import React, { useState, useRef, useEffect, useCallback, useMemo, useDeferredValue, memo } from 'react';
 import ReactMarkdown from 'react-markdown';
 import {
   ArrowUp,
@@ -23,14 +23,55 @@ import { agentManager } from '../AgentManager';
 import CodeBlock, { InlineCode } from './CodeBlock';
 import { ChatImage, ImageModal } from './Gallery';
 
-// Helper to convert file to base64
-const fileToBase64 = (file) => {
-  return new Promise((resolve, reject) => {
-    const reader = new FileReader();
-    reader.onload = () => resolve(reader.result);
-    reader.onerror = reject;
-    reader.readAsDataURL(file);
-  });
+// Helper to build an attachment from a file
+// Images are previewed through an object URL instead of a base64 data URL,
+// so the bytes are never copied or inflated just to show a thumbnail
+const createAttachment = (file, name = file.name) => {
+  const isImage = file.type.startsWith('image/');
+  return {
+    name,
+    type: isImage ? 'image' : 'file',
+    data: isImage ? URL.createObjectURL(file) : null,
+    mimeType: file.type,
+  };
+};
+
+// Release the object URL held by an attachment preview
+const releaseAttachment = (attachment) => {
+  if (attachment.data) URL.revokeObjectURL(attachment.data);
+};
+
+// Minimum interval between store updates while a response is streaming
+const STREAM_UPDATE_INTERVAL_MS = 50;
+
+// Throttle streamed content updates - chunks arrive far faster than the UI
+// needs to repaint, and every update re-renders the markdown of the message
+const createStreamUpdater = (update, interval = STREAM_UPDATE_INTERVAL_MS) => {
+  let pending = null;
+  let lastUpdate = 0;
+  let timer = null;
+
+  const flush = () => {
+    clearTimeout(timer);
+    timer = null;
+    if (pending !== null) {
+      update(pending);
+      pending = null;
+      lastUpdate = Date.now();
+    }
+  };
+
+  const push = (content) => {
+    pending = content;
+    const elapsed = Date.now() - lastUpdate;
+    if (elapsed >= interval) {
+      flush();
+    } else if (!timer) {
+      timer = setTimeout(flush, interval - elapsed);
+    }
+  };
+
+  return { push, flush };
 };
 
 // Attachment preview component
@@ -97,10 +138,13 @@ const enhancePromptWithAI = async (prompt, isImageMode, apiKey, currentModel) =>
   }
 };
 
+// Markdown code-fence class name, e.g. "language-js"
+const LANGUAGE_CLASS_REGEX = /language-(\w+)/;
+
 // Memoized markdown components to prevent recreation on each render
 const createMarkdownComponents = () => ({
   code({ node, inline, className, children, ...props }) {
-    const match = /language-(\w+)/.exec(className || '');
+    const match = LANGUAGE_CLASS_REGEX.exec(className || '');
     const language = match ? match[1] : '';
     const code = String(children).replace(/\n$/, '');
 
@@ -117,6 +161,11 @@ const createMarkdownComponents = () => ({
   ),
 });
 
+// Markdown body - memoized so a deferred (stale) value skips re-parsing
+const MarkdownContent = memo(function MarkdownContent({ content, components }) {
+  return <ReactMarkdown components={components}>{content}</ReactMarkdown>;
+});
+
 // Message component with remake option - memoized for performance
 const Message = memo(function Message({ message, isCollapsed, onToggleCollapse, onRemake, isRemaking, isStreaming, onImageClick }) {
   const isUser = message.role === 'user';
@@ -150,6 +199,10 @@ const Message = memo(function Message({ message, isCollapsed, onToggleCollapse,
   // Memoize markdown components
   const markdownComponents = useMemo(() => createMarkdownComponents(), []);
 
+  // While streaming, parse markdown at low priority so typing, scrolling and
+  // clicks are never blocked behind re-rendering a long response
+  const deferredContent = useDeferredValue(message.content);
+
   return (
     <div className={`flex items-start gap-2 ${isUser ? 'justify-end' : 'justify-start'} group relative`}>
       
@@ -164,7 +217,10 @@ const Message = memo(function Message({ message, isCollapsed, onToggleCollapse,
             <ChatImage image={message.image} onClick={() => onImageClick(message.image)} />
           ) : (
             <div className="prose-chat">
-              <ReactMarkdown components={markdownComponents}>{message.content}</ReactMarkdown>
+              <MarkdownContent
+                content={isStreaming ? deferredContent : message.content}
+                components={markdownComponents}
+              />
             </div>
           )}
         </div>
@@ -275,6 +331,7 @@ function TypingIndicator() {
 export default function ChatInterface() {
   const {
     settings,
+    chats,
     currentChatId,
     sidebarOpen,
     setSidebarOpen,
@@ -304,9 +361,13 @@ export default function ChatInterface() {
   const textareaRef = useRef(null);
   const dropZoneRef = useRef(null);
   const fileInputRef = useRef(null);
+  // In-flight generations: AbortController -> id of the chat it writes to
+  const inflightRequestsRef = useRef(new Map());
 
   const currentChat = getCurrentChat();
   const isImageMode = settings.generationMode === 'image';
+  // Trimmed once per render and shared by the handlers and input controls below
+  const trimmedInput = input.trim();
 
   // Track if user has manually scrolled up during streaming
   const [userScrolledUp, setUserScrolledUp] = useState(false);
@@ -337,6 +398,35 @@ export default function ChatInterface() {
     if (!currentChatId) createChat();
   }, [currentChatId, createChat]);
 
+  // Cancel generations whose chat was deleted - otherwise the request keeps
+  // streaming (and spending tokens) into a chat that no longer exists.
+  // Keyed on the chat count so streaming updates don't re-run it; the
+  // count only shrinks through deleteChat and deleteAllChats (which keeps
+  // pinned chats), so every deletion still reaches this effect
+  const chatCount = chats.length;
+  const prevChatCountRef = useRef(chatCount);
+  useEffect(() => {
+    // `chats` comes from the closure, which is only safe because the effect
+    // runs in the same render that changed chatCount and so sees its chats
+    const shrank = chatCount < prevChatCountRef.current;
+    prevChatCountRef.current = chatCount;
+    const inflight = inflightRequestsRef.current;
+    if (!shrank || inflight.size === 0) return;
+    const chatIds = new Set(chats.map(c => c.id));
+    inflight.forEach((chatId, controller) => {
+      if (!chatIds.has(chatId)) {
+        controller.abort();
+        inflight.delete(controller);
+      }
+    });
+  }, [chatCount]);
+
+  // Register an abortable request for a chat; call the result when done
+  const trackRequest = (chatId, controller) => {
+    inflightRequestsRef.current.set(controller, chatId);
+    return () => inflightRequestsRef.current.delete(controller);
+  };
+
   // Handle mobile viewport height (for virtual keyboard)
   useEffect(() => {
     const setViewportHeight = () => {
@@ -435,15 +525,8 @@ export default function ChatInterface() {
   const processFiles = async (files) => {
     for (const file of files) {
       try {
-        const isImage = file.type.startsWith('image/');
-        const data = await fileToBase64(file);
-        
-        setAttachments(prev => [...prev, {
-          name: file.name,
-          type: isImage ? 'image' : 'file',
-          data: data,
-          mimeType: file.type,
-        }]);
+        const attachment = createAttachment(file);
+        setAttachments(prev => [...prev, attachment]);
       } catch (error) {
         console.error('Error processing file:', error);
       }
@@ -474,13 +557,8 @@ export default function ChatInterface() {
         const file = item.getAsFile();
         if (file) {
           try {
-            const data = await fileToBase64(file);
-            setAttachments(prev => [...prev, {
-              name: `pasted-image-${Date.now()}.png`,
-              type: 'image',
-              data: data,
-              mimeType: file.type,
-            }]);
+            const attachment = createAttachment(file, `pasted-image-${Date.now()}.png`);
+            setAttachments(prev => [...prev, attachment]);
           } catch (error) {
             console.error('Error processing pasted image:', error);
           }
@@ -491,6 +569,7 @@ export default function ChatInterface() {
 
   // Remove attachment
   const removeAttachment = (index) => {
+    releaseAttachment(attachments[index]);
     setAttachments(prev => prev.filter((_, i) => i !== index));
   };
 
@@ -501,7 +580,7 @@ export default function ChatInterface() {
 
   // AI-powered enhance
   const handleEnhancePrompt = async () => {
-    if (!input.trim() || isEnhancing) return;
+    if (!trimmedInput || isEnhancing) return;
     setIsEnhancing(true);
     
     try {
@@ -531,6 +610,9 @@ export default function ChatInterface() {
     const userMessage = currentChat.messages[msgIndex - 1];
     if (userMessage.role !== 'user') return;
     
+    const controller = new AbortController();
+    const untrackRequest = trackRequest(currentChatId, controller);
+    
     try {
       const messages = currentChat.messages.slice(0, msgIndex).map(m => ({ 
         role: m.role, 
@@ -538,26 +620,34 @@ export default function ChatInterface() {
       }));
 
       let fullContent = '';
+      const streamUpdater = createStreamUpdater(content => updateMessage(currentChatId, messageId, content));
       for await (const chunk of streamChatCompletion(messages, {
         model: newModel,
         apiKey: settings.apiKey,
         systemPrompt: settings.systemPrompt,
         temperature: settings.temperature,
+        signal: controller.signal,
       })) {
         fullContent += chunk;
-        updateMessage(currentChatId, messageId, fullContent);
+        streamUpdater.push(fullContent);
       }
+      streamUpdater.flush();
     } catch (error) {
-      console.error('Remake error:', error);
+      if (error.name === 'AbortError') {
+        console.log('Remake cancelled');
+      } else {
+        console.error('Remake error:', error);
+      }
     } finally {
+      untrackRequest();
       setRemakingMessageId(null);
     }
   };
 
   const handleSubmit = async () => {
-    if ((!input.trim() && attachments.length === 0) || isLoading) return;
+    if ((!trimmedInput && attachments.length === 0) || isLoading) return;
 
-    let userMessage = input.trim();
+    let userMessage = trimmedInput;
     
     // Add attachment info to message
     if (attachments.length > 0) {
@@ -567,19 +657,25 @@ export default function ChatInterface() {
     
     setInput('');
     setAttachments([]);
+    attachments.forEach(releaseAttachment);
 
     let chatId = currentChatId || createChat();
     
-    // Create message with attachments
+    // Create message with attachments (metadata only - previews are not persisted)
     const messageData = {
       role: 'user',
       content: userMessage,
-      attachments: attachments.length > 0 ? attachments : undefined,
+      attachments: attachments.length > 0
+        ? attachments.map(({ name, type, mimeType }) => ({ name, type, mimeType }))
+        : undefined,
     };
     addMessage(chatId, messageData);
     setIsLoading(true);
     setIsWaitingForResponse(true);
 
+    const controller = new AbortController();
+    const untrackRequest = trackRequest(chatId, controller);
+
     try {
       if (settings.generationMode === 'image') {
         const result = await generateImage(userMessage, {
@@ -613,6 +709,7 @@ export default function ChatInterface() {
 
         let fullContent = '';
         let firstChunkReceived = false;
+        const streamUpdater = createStreamUpdater(content => updateMessage(chatId, assistantMsgId, content));
         
         // Use web search mode if enabled or URLs detected
         if (shouldUseWebSearch) {
@@ -623,6 +720,7 @@ export default function ChatInterface() {
             temperature: settings.temperature,
             previousMessages: messages,
             userTimezone: Intl.DateTimeFormat().resolvedOptions().timeZone,
+            signal: controller.signal,
           })) {
             if (!firstChunkReceived) {
               firstChunkReceived = true;
@@ -631,7 +729,7 @@ export default function ChatInterface() {
               fullContent = '';
             }
             fullContent += chunk;
-            updateMessage(chatId, assistantMsgId, fullContent);
+            streamUpdater.push(fullContent);
           }
         } else {
           // Standard chat completion
@@ -643,16 +741,18 @@ export default function ChatInterface() {
             systemPrompt: settings.systemPrompt,
             temperature: settings.temperature,
             agentMode: settings.agentMode,
+            signal: controller.signal,
           })) {
             if (!firstChunkReceived) {
               firstChunkReceived = true;
               setIsWaitingForResponse(false);
             }
             fullContent += chunk;
-            updateMessage(chatId, assistantMsgId, fullContent);
+            streamUpdater.push(fullContent);
           }
         }
 
+        streamUpdater.flush();
         setStreamingMessageId(null);
 
         if (settings.agentMode) {
@@ -664,12 +764,18 @@ export default function ChatInterface() {
         }
       }
     } catch (error) {
+      if (error.name === 'AbortError') {
+        console.log('Generation cancelled');
+        setStreamingMessageId(null);
+        return;
+      }
       console.error('API Error:', error);
       if (streamingMessageId) {
         deleteMessage(chatId, streamingMessageId);
         setStreamingMessageId(null);
       }
     } finally {
+      untrackRequest();
       setIsLoading(false);
       setIsWaitingForResponse(false);
     }
@@ -784,7 +890,7 @@ export default function ChatInterface() {
       {/* Floating Input with ambient glow */}
       <div className="p-5 pt-2 chat-input-wrapper">
         <div className="max-w-2xl mx-auto">
-          <div className={`ambient-glow ${input.trim() || attachments.length > 0 ? 'has-text' : ''}`}>
+          <div className={`ambient-glow ${trimmedInput || attachments.length > 0 ? 'has-text' : ''}`}>
             {/* Attachment preview */}
             <AttachmentPreview attachments={attachments} onRemove={removeAttachment} />
             
@@ -859,9 +965,9 @@ export default function ChatInterface() {
                 onClick={handleEnhancePrompt}
                 onMouseEnter={() => setIsEnhanceHovered(true)}
                 onMouseLeave={() => setIsEnhanceHovered(false)}
-                disabled={isEnhancing || !input.trim()}
+                disabled={isEnhancing || !trimmedInput}
                 className={`mode-toggle-btn flex-shrink-0 flex items-center gap-1 transition-all duration-200 ${
-                  input.trim() ? 'text-white/30 hover:text-white/60' : 'text-white/10 cursor-default'
+                  trimmedInput ? 'text-white/30 hover:text-white/60' : 'text-white/10 cursor-default'
                 }`}
                 title="Enhance prompt"
               >
@@ -872,7 +978,7 @@ export default function ChatInterface() {
                 )}
                 <span
                   className={`text-xs overflow-hidden whitespace-nowrap transition-all duration-200 ${
-                    isEnhanceHovered && input.trim() ? 'max-w-[60px] opacity-100' : 'max-w-0 opacity-0'
+                    isEnhanceHovered && trimmedInput ? 'max-w-[60px] opacity-100' : 'max-w-0 opacity-0'
                   }`}
                 >
                   Enhance
@@ -896,9 +1002,9 @@ export default function ChatInterface() {
               {/* Send Button */}
               <button
                 onClick={handleSubmit}
-                disabled={isLoading || (!input.trim() && attachments.length === 0)}
+                disabled={isLoading || (!trimmedInput && attachments.length === 0)}
                 className={`flex-shrink-0 p-2 rounded-full transition-all ${
-                  (input.trim() || attachments.length > 0) && !isLoading
+                  (trimmedInput || attachments.length > 0) && !isLoading
                     ? 'bg-white text-black hover:bg-white/90 active:scale-95'
                     : 'bg-white/10 text-white/20'
                 }`}
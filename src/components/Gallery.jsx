@@ -10,6 +10,16 @@ import {
 } from 'lucide-react';
 import useChatStore from '../store';
 
+// First 8 bytes of every PNG file
+const PNG_SIGNATURE = [0x89, 0x50, 0x4E, 0x47, 0x0D, 0x0A, 0x1A, 0x0A];
+
+// Check the actual bytes - data URLs are sometimes labelled image/png
+// regardless of their real format
+const isPngBlob = async (blob) => {
+  const header = new Uint8Array(await blob.slice(0, PNG_SIGNATURE.length).arrayBuffer());
+  return PNG_SIGNATURE.every((byte, i) => header[i] === byte);
+};
+
 // Full Image Modal - Animated (exported for use in ChatInterface)
 export function ImageModal({ isOpen, onClose, image }) {
   const [copied, setCopied] = useState(false);
@@ -48,7 +58,8 @@ export function ImageModal({ isOpen, onClose, image }) {
         const blob = await response.blob();
         
         // Convert to PNG if needed for clipboard compatibility
-        const pngBlob = await new Promise((resolve) => {
+        // (real PNG payloads are copied as-is without a canvas round-trip)
+        const pngBlob = blob.type === 'image/png' && await isPngBlob(blob) ? blob : await new Promise((resolve) => {
           const img = new Image();
           img.crossOrigin = 'anonymous';
           img.onload = () => {
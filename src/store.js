@@ -1,6 +1,61 @@
 import { create } from 'zustand';
 import { persist } from 'zustand/middleware';
 
+// Delay before persisting state to localStorage
+const PERSIST_DEBOUNCE_MS = 1000;
+
+// Debounced localStorage adapter for the persist middleware
+// Streaming updates change the store many times per second; keep only the
+// latest snapshot and serialize it at most once per delay (and on page hide)
+const createDebouncedStorage = (delay) => {
+  const pending = new Map();
+  let timer = null;
+
+  const flush = () => {
+    clearTimeout(timer);
+    timer = null;
+    pending.forEach((value, name) => {
+      try {
+        localStorage.setItem(name, JSON.stringify(value));
+      } catch (error) {
+        console.error('Failed to persist state:', error);
+      }
+    });
+    pending.clear();
+  };
+
+  if (typeof window !== 'undefined') {
+    window.addEventListener('pagehide', flush);
+    window.addEventListener('beforeunload', flush);
+  }
+
+  return {
+    getItem: (name) => {
+      if (pending.has(name)) return pending.get(name);
+      const str = localStorage.getItem(name);
+      return str ? JSON.parse(str) : null;
+    },
+    setItem: (name, value) => {
+      pending.set(name, value);
+      if (!timer) timer = setTimeout(flush, delay);
+    },
+    removeItem: (name) => {
+      pending.delete(name);
+      localStorage.removeItem(name);
+    },
+  };
+};
+
+// Replace a single chat by id, leaving every other chat untouched
+// Locates the chat once instead of re-checking the id across a full map
+const updateChatById = (chats, chatId, updater) => {
+  const index = chats.findIndex(c => c.id === chatId);
+  if (index === -1) return chats;
+  const next = chats.slice();
+  next[index] = updater(chats[index]);
+  return next;
+};
+
 // Generate unique ID
 const generateId = () => Math.random().toString(36).substring(2, 15) + Date.now().toString(36);
 
@@ -78,9 +133,7 @@ export const useChatStore = create(
 
       pinChat: (chatId) => {
         set(state => ({
-          chats: state.chats.map(chat =>
-            chat.id === chatId ? { ...chat, pinned: !chat.pinned } : chat
-          ),
+          chats: updateChatById(state.chats, chatId, chat => ({ ...chat, pinned: !chat.pinned })),
         }));
       },
 
@@ -98,9 +151,7 @@ export const useChatStore = create(
 
       updateChatTitle: (chatId, title) => {
         set(state => ({
-          chats: state.chats.map(chat =>
-            chat.id === chatId ? { ...chat, title, updatedAt: Date.now() } : chat
-          ),
+          chats: updateChatById(state.chats, chatId, chat => ({ ...chat, title, updatedAt: Date.now() })),
         }));
       },
 
@@ -112,22 +163,19 @@ export const useChatStore = create(
           timestamp: Date.now(),
         };
         set(state => ({
-          chats: state.chats.map(chat => {
-            if (chat.id === chatId) {
-              const messages = [...chat.messages, messageWithId];
-              // Auto-generate title from first user message
-              let title = chat.title;
-              if (chat.title === 'New Chat' && message.role === 'user') {
-                title = message.content.slice(0, 50) + (message.content.length > 50 ? '...' : '');
-              }
-              return {
-                ...chat,
-                messages,
-                title,
-                updatedAt: Date.now(),
-              };
+          chats: updateChatById(state.chats, chatId, chat => {
+            const messages = [...chat.messages, messageWithId];
+            // Auto-generate title from first user message
+            let title = chat.title;
+            if (chat.title === 'New Chat' && message.role === 'user') {
+              title = message.content.slice(0, 50) + (message.content.length > 50 ? '...' : '');
             }
-            return chat;
+            return {
+              ...chat,
+              messages,
+              title,
+              updatedAt: Date.now(),
+            };
           }),
         }));
         return messageWithId.id;
@@ -135,63 +183,55 @@ export const useChatStore = create(
 
       updateMessage: (chatId, messageId, content) => {
         set(state => ({
-          chats: state.chats.map(chat => {
-            if (chat.id === chatId) {
-              return {
-                ...chat,
-                messages: chat.messages.map(msg =>
-                  msg.id === messageId ? { ...msg, content } : msg
-                ),
-                updatedAt: Date.now(),
-              };
-            }
-            return chat;
+          chats: updateChatById(state.chats, chatId, chat => {
+            // Streaming always targets the newest message, so search from the end
+            let index = chat.messages.length - 1;
+            while (index >= 0 && chat.messages[index].id !== messageId) index--;
+            if (index === -1) return chat;
+            const messages = chat.messages.slice();
+            messages[index] = { ...messages[index], content };
+            return {
+              ...chat,
+              messages,
+              updatedAt: Date.now(),
+            };
           }),
         }));
       },
 
       deleteMessage: (chatId, messageId) => {
         set(state => ({
-          chats: state.chats.map(chat => {
-            if (chat.id === chatId) {
-              return {
-                ...chat,
-                messages: chat.messages.filter(msg => msg.id !== messageId),
-                updatedAt: Date.now(),
-              };
-            }
-            return chat;
-          }),
+          chats: updateChatById(state.chats, chatId, chat => ({
+            ...chat,
+            messages: chat.messages.filter(msg => msg.id !== messageId),
+            updatedAt: Date.now(),
+          })),
         }));
       },
 
       // Actions - Files (VFS)
       addFiles: (chatId, files) => {
         set(state => ({
-          chats: state.chats.map(chat => {
-            if (chat.id === chatId) {
-              const existingFilenames = new Set(chat.files.map(f => f.filename));
-              const newFiles = files.filter(f => !existingFilenames.has(f.filename));
-              const updatedFiles = chat.files.map(existing => {
-                const updated = files.find(f => f.filename === existing.filename);
-                return updated ? { ...existing, code: updated.code } : existing;
-              });
-              return {
-                ...chat,
-                files: [...updatedFiles, ...newFiles],
-                updatedAt: Date.now(),
-              };
-            }
-            return chat;
+          chats: updateChatById(state.chats, chatId, chat => {
+            const existingFilenames = new Set(chat.files.map(f => f.filename));
+            const newFiles = files.filter(f => !existingFilenames.has(f.filename));
+            const incomingByName = new Map(files.map(f => [f.filename, f]));
+            const updatedFiles = chat.files.map(existing => {
+              const updated = incomingByName.get(existing.filename);
+              return updated ? { ...existing, code: updated.code } : existing;
+            });
+            return {
+              ...chat,
+              files: [...updatedFiles, ...newFiles],
+              updatedAt: Date.now(),
+            };
           }),
         }));
       },
 
       clearFiles: (chatId) => {
         set(state => ({
-          chats: state.chats.map(chat =>
-            chat.id === chatId ? { ...chat, files: [], updatedAt: Date.now() } : chat
-          ),
+          chats: updateChatById(state.chats, chatId, chat => ({ ...chat, files: [], updatedAt: Date.now() })),
         }));
       },
 
@@ -246,6 +286,7 @@ export const useChatStore = create(
     }),
     {
       name: 'ai-chat-storage',
+      storage: createDebouncedStorage(PERSIST_DEBOUNCE_MS),
       partialize: (state) => ({
         chats: state.chats,
         currentChatId: state.currentChatId,